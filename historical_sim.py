@@ -1,6 +1,5 @@
 import csv
 import pandas as pd
-from datetime import timedelta
 from moc_sim import StableSystem
 
 
@@ -51,13 +50,8 @@ def adjust_supply(system, tcov, target_ratio=0.1):
     return delta
 
 
-def main(
-    price_file='btcdata.csv',
-    config_file='config.json',
-    weekly=True,
-):
-    system = StableSystem.from_config(config_file)
-    prices = load_price_data(price_file, weekly=weekly)
+def simulate_weekly(system, prices):
+    """Run the weekly rebalance over ``prices`` yielding one log line per step."""
     ma_history = [system.price_ma180]
 
     for date, price in prices:
@@ -65,7 +59,7 @@ def main(
         system.price_ma180 = update_price_ma180(ma_history, price)
         tcov = system.target_coverage()
         change = adjust_supply(system, tcov)
-        line = {
+        yield {
             'date': date,
             'price': price,
             'doc_supply': system.doc_supply,
@@ -76,6 +70,17 @@ def main(
             'real_cov': system.real_coverage(),
             'change_doc': change,
         }
+
+
+def main(
+    price_file='btcdata.csv',
+    config_file='config.json',
+    weekly=True,
+):
+    system = StableSystem.from_config(config_file)
+    prices = load_price_data(price_file, weekly=weekly)
+
+    for line in simulate_weekly(system, prices):
         print(
             f"{line['date']} Price:{line['price']:.2f} DoC:{line['doc_supply']:.2f} "
             f"BTC:{line['btc_collateral']:.4f} Avail:{line['doc_available']:.2f} "
@@ -87,25 +92,31 @@ def main(
     system.summary()
 
 
-def run_historical_with_deposit(config_path, price_csv, funding_csv, ma180_csv):
-    """Run historical simulation using bucket deposit logic."""
-    system = StableSystem.from_config(config_path)
+def load_deposit_data(price_csv, funding_csv, ma180_csv):
+    """Load the inputs of the bucket deposit simulation.
 
+    Returns the last BTC price of each day, a ``date -> funding rate`` mapping
+    and the ma180 frame indexed by date.
+    """
     price_df = pd.read_csv(price_csv, parse_dates=['Time'])
     price_df['date'] = price_df['Time'].dt.floor('D')
+    daily_prices = price_df.groupby('date')['BTC'].last()
 
     funding_df = pd.read_csv(funding_csv, parse_dates=['date'])
+    funding_rates = (
+        funding_df.drop_duplicates('date')
+        .set_index('date')['funding_rate_daily']
+        .to_dict()
+    )
 
     ma180_df = pd.read_csv(ma180_csv, parse_dates=['date']).set_index('date')
+    return daily_prices, funding_rates, ma180_df
 
-    dates = sorted(price_df['date'].unique())
-    for current_date in dates:
-        price_usd = price_df.loc[price_df['date'] == current_date, 'BTC'].iloc[-1]
-        row = funding_df.loc[funding_df['date'] == current_date]
-        if not row.empty:
-            funding_rate = float(row['funding_rate_daily'].iloc[0])
-        else:
-            funding_rate = 0.0
+
+def simulate_with_deposit(system, daily_prices, funding_rates, ma180_df):
+    """Step ``system`` through every day of ``daily_prices``."""
+    for current_date, price_usd in daily_prices.items():
+        funding_rate = float(funding_rates.get(current_date, 0.0))
         system.current_price_usd = price_usd
         system.step_one_day(
             current_date=current_date,
@@ -113,6 +124,16 @@ def run_historical_with_deposit(config_path, price_csv, funding_csv, ma180_csv):
             historical_ma180_df=ma180_df,
             funding_rate_market=funding_rate,
         )
+    return system
+
+
+def run_historical_with_deposit(config_path, price_csv, funding_csv, ma180_csv):
+    """Run historical simulation using bucket deposit logic."""
+    system = StableSystem.from_config(config_path)
+    daily_prices, funding_rates, ma180_df = load_deposit_data(
+        price_csv, funding_csv, ma180_csv
+    )
+    simulate_with_deposit(system, daily_prices, funding_rates, ma180_df)
 
     print("=== Resultados finales ===")
     print(f"  DoC en vault_deposit: {system.vault_docs:.4f}")
@@ -16,6 +16,36 @@ def print_help():
     print("  exit")
 
 
+def run_command(system, cmd, args):
+    """Apply a single UI command to ``system``.
+
+    Returns ``False`` when ``cmd`` or its arguments are not recognised.
+    """
+    if cmd == "mint_doc" and len(args) == 1:
+        system.mint_doc(float(args[0]))
+    elif cmd == "mint_doc_amt" and len(args) == 1:
+        system.mint_doc_amount(float(args[0]))
+    elif cmd == "redeem_doc" and len(args) == 1:
+        system.redeem_doc(float(args[0]))
+    elif cmd == "mint_bpro" and len(args) == 1:
+        system.mint_bpro(float(args[0]))
+    elif cmd == "redeem_bpro" and len(args) == 1:
+        system.redeem_bpro(float(args[0]))
+    elif cmd == "set_price" and len(args) == 1:
+        system.set_price(float(args[0]))
+    elif cmd == "advance_time" and len(args) == 1:
+        system.advance_time(int(args[0]))
+    elif cmd == "summary" and len(args) == 0:
+        system.summary()
+    elif cmd == "panel" and len(args) == 0:
+        system.panel()
+    elif cmd == "help":
+        print_help()
+    else:
+        return False
+    return True
+
+
 def main(config_file="config.json"):
     try:
         system = StableSystem.from_config(config_file)
@@ -36,27 +66,7 @@ def main(config_file="config.json"):
         if cmd in ("exit", "quit"):
             break
         try:
-            if cmd == "mint_doc" and len(args) == 1:
-                system.mint_doc(float(args[0]))
-            elif cmd == "mint_doc_amt" and len(args) == 1:
-                system.mint_doc_amount(float(args[0]))
-            elif cmd == "redeem_doc" and len(args) == 1:
-                system.redeem_doc(float(args[0]))
-            elif cmd == "mint_bpro" and len(args) == 1:
-                system.mint_bpro(float(args[0]))
-            elif cmd == "redeem_bpro" and len(args) == 1:
-                system.redeem_bpro(float(args[0]))
-            elif cmd == "set_price" and len(args) == 1:
-                system.set_price(float(args[0]))
-            elif cmd == "advance_time" and len(args) == 1:
-                system.advance_time(int(args[0]))
-            elif cmd == "summary" and len(args) == 0:
-                system.summary()
-            elif cmd == "panel" and len(args) == 0:
-                system.panel()
-            elif cmd == "help":
-                print_help()
-            else:
+            if not run_command(system, cmd, args):
                 print("Unknown command. Type 'help' for instructions.")
         except Exception as e:
             print(f"Error: {e}")
@@ -0,0 +1,74 @@
+"""Small client for ``sim_server.py`` usable from notebooks and tests."""
+import http.client
+import json
+from urllib.parse import quote
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class SimServerError(Exception):
+    """Error reported by the simulation server."""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class SimClient:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=60.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            headers = {}
+            body = None
+            if payload is not None:
+                body = json.dumps(payload).encode()
+                headers["Content-Type"] = "application/json"
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise SimServerError(response.status, data.get("error", ""))
+        return data
+
+    @staticmethod
+    def _session_path(name, *rest):
+        return "/".join(["/sessions", quote(name, safe=""), *rest])
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def sessions(self):
+        return self._request("GET", "/sessions")["sessions"]
+
+    def create_session(self, name, config="config.json", run=None, replace=False):
+        """Create a session from ``config`` or from the final state of ``run``."""
+        payload = {"name": name, "config": config, "replace": replace}
+        if run is not None:
+            payload["run"] = run
+        return self._request("POST", "/sessions", payload)
+
+    def drop_session(self, name):
+        self._request("DELETE", self._session_path(name))
+
+    def command(self, name, line):
+        """Run a ``moc_ui`` command, returning its output and the new metrics."""
+        return self._request("POST", self._session_path(name, "command"), {"command": line})
+
+    def metrics(self, name):
+        return self._request("GET", self._session_path(name, "metrics"))
+
+    def run(self, kind="deposit", **params):
+        """Run (or fetch the cached result of) a historical simulation."""
+        return self._request("POST", "/runs", {"kind": kind, **params})
+
+    def reload(self):
+        self._request("POST", "/reload")
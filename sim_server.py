@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""Long running simulation server keeping market data and sessions in memory.
+
+The server listens on localhost and speaks JSON over HTTP:
+
+    GET    /health                      server status
+    GET    /sessions                    list session names
+    POST   /sessions                    {"name", "config"?, "run"?, "replace"?}
+    DELETE /sessions/<name>             drop a session
+    POST   /sessions/<name>/command     {"command": "mint_doc 0.1"}
+    GET    /sessions/<name>/metrics     current state of the session
+    POST   /runs                        historical run, see ``SimulationService.run``
+    POST   /reload                      forget cached data and run results
+
+Price series, ma180 and funding data are parsed once and reused until the
+source file changes. Historical runs are memoised so repeated queries are
+answered from memory. Requests are handled by a fixed pool of worker threads.
+"""
+import contextlib
+import copy
+import io
+import json
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import unquote, urlsplit
+
+from moc_sim import StableSystem
+from moc_ui import run_command
+from historical_sim import (
+    load_deposit_data,
+    load_price_data,
+    simulate_weekly,
+    simulate_with_deposit,
+)
+from sim_client import DEFAULT_HOST, DEFAULT_PORT
+
+
+_RUN_FILES = ("config", "price_file", "price_csv", "funding_csv", "ma180_csv")
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """``sys.stdout`` replacement that lets each worker capture its own prints.
+
+    ``contextlib.redirect_stdout`` swaps the stream for the whole process, so
+    concurrent requests would mix their output. The wrapper reinstalls itself
+    if something else replaces ``sys.stdout`` while the server runs.
+    """
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self):
+        with self._lock:
+            if sys.stdout is not self:
+                self._fallback = sys.stdout
+                sys.stdout = self
+
+    def _target(self):
+        return getattr(self._local, "buffer", None) or self._fallback
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+    @contextlib.contextmanager
+    def capture(self):
+        self.install()
+        buffer = io.StringIO()
+        self._local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+
+def _json_value(value):
+    """Map ``inf``/``nan`` to ``None`` so responses stay valid JSON."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def system_metrics(system):
+    """Return the observable state of ``system`` as a plain dict.
+
+    Non-finite values, such as ``real_cov`` without DoC, are reported as ``None``.
+    """
+    metrics = {
+        "time": system.time,
+        "price": system.price,
+        "price_ema": system.price_ema,
+        "price_ma180": system.price_ma180,
+        "btc_collateral": system.btc_collateral,
+        "doc_supply": system.doc_supply,
+        "bpro_supply": system.bpro_supply,
+        "vault_docs": system.vault_docs,
+        "doc_available": system.doc_available_to_mint(),
+        "target_cov": system.target_coverage(),
+        "real_cov": system.real_coverage(),
+        "leverage": system.leverage(),
+        "bpro_price": system.bpro_price(),
+        "bpro_price_btc": system.bpro_price_btc(),
+    }
+    return {k: _json_value(v) for k, v in metrics.items()}
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _path_param(params, key, default):
+    value = params.get(key, default)
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"'{key}' must be a non-empty string")
+    return value
+
+
+def _bool_param(params, key, default):
+    value = params.get(key, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"'{key}' must be a boolean")
+    return value
+
+
+class _Memo:
+    """Values computed once per key and source file modification times.
+
+    Computations run outside the lock; concurrent callers asking for the same
+    key wait on the first caller's future instead of repeating the work.
+    """
+
+    def __init__(self, max_entries=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+
+    def get(self, key, paths, compute):
+        stamp = tuple(_mtime(p) for p in paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None or entry[0] != stamp
+            if owner:
+                entry = (stamp, Future())
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if self._max_entries is not None:
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        future = entry[1]
+        if owner:
+            try:
+                future.set_result(compute())
+            except BaseException as e:
+                future.set_exception(e)
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                raise
+        return future.result()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DataCache:
+    """Parsed input files keyed by path and modification time."""
+
+    def __init__(self):
+        self._memo = _Memo()
+
+    def _get(self, key, paths, loader):
+        return self._memo.get(key, paths, loader)
+
+    def config_template(self, config_file):
+        """Return a pristine system for ``config_file``; callers must copy it."""
+        return self._get(
+            ("config", config_file),
+            [config_file],
+            lambda: StableSystem.from_config(config_file),
+        )
+
+    def prices(self, price_file, weekly):
+        return self._get(
+            ("prices", price_file, weekly),
+            [price_file],
+            lambda: load_price_data(price_file, weekly=weekly),
+        )
+
+    def deposit_data(self, price_csv, funding_csv, ma180_csv):
+        return self._get(
+            ("deposit", price_csv, funding_csv, ma180_csv),
+            [price_csv, funding_csv, ma180_csv],
+            lambda: load_deposit_data(price_csv, funding_csv, ma180_csv),
+        )
+
+    def clear(self):
+        self._memo.clear()
+
+
+class UnknownSession(KeyError):
+    """Raised when a request names a session that does not exist."""
+
+
+class _Session:
+    def __init__(self, system):
+        self.system = system
+        self.lock = threading.Lock()
+
+
+class SimulationService:
+    """Named ``StableSystem`` sessions plus memoised historical runs."""
+
+    def __init__(self, stdout, max_runs=64):
+        self.data = DataCache()
+        self._stdout = stdout
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._runs = _Memo(max_entries=max_runs)
+
+    def preload(self, config="config.json", price_file="btcdata.csv",
+                funding_csv="merged_btc_funding.csv", ma180_csv="btc_ma180.csv"):
+        """Parse the default input files so the first requests find them warm."""
+        self.data.config_template(config)
+        self.data.prices(price_file, True)
+        self.data.deposit_data(price_file, funding_csv, ma180_csv)
+
+    # -- sessions -------------------------------------------------------
+    def list_sessions(self):
+        with self._lock:
+            return sorted(self._sessions)
+
+    def create_session(self, name, config="config.json", run=None, replace=False):
+        """Create session ``name`` from ``config`` or the final state of ``run``."""
+        if not isinstance(name, str) or not name:
+            raise ValueError("Session name is required")
+        if not isinstance(replace, bool):
+            raise ValueError("'replace' must be a boolean")
+        if run is not None:
+            source = self._run(run)[1]
+        else:
+            source = self.data.config_template(
+                _path_param({"config": config}, "config", "config.json")
+            )
+        system = copy.deepcopy(source)
+        with self._lock:
+            if name in self._sessions and not replace:
+                raise ValueError(f"Session '{name}' already exists")
+            self._sessions[name] = _Session(system)
+        return system_metrics(system)
+
+    def drop_session(self, name):
+        with self._lock:
+            if self._sessions.pop(name, None) is None:
+                raise UnknownSession(name)
+
+    def _session(self, name):
+        with self._lock:
+            try:
+                return self._sessions[name]
+            except KeyError:
+                raise UnknownSession(name) from None
+
+    def command(self, name, line):
+        """Run a ``moc_ui`` command line against session ``name``."""
+        if not isinstance(line, str):
+            raise ValueError("'command' must be a string")
+        tokens = line.split()
+        if not tokens:
+            raise ValueError("Empty command")
+        session = self._session(name)
+        with session.lock, self._stdout.capture() as output:
+            if not run_command(session.system, tokens[0], tokens[1:]):
+                raise ValueError(f"Unknown command '{tokens[0]}'")
+            metrics = system_metrics(session.system)
+        return {"output": output.getvalue(), "metrics": metrics}
+
+    def metrics(self, name):
+        session = self._session(name)
+        with session.lock:
+            return system_metrics(session.system)
+
+    # -- historical runs -----------------------------------------------
+    def run(self, params):
+        """Run a historical simulation, reusing a previous result when possible.
+
+        ``params["kind"]`` selects the simulation:
+
+        * ``"weekly"``: ``historical_sim.main`` style rebalance. Accepts
+          ``config``, ``price_file`` and ``weekly``; returns every log row.
+        * ``"deposit"``: ``run_historical_with_deposit``. Accepts ``config``,
+          ``price_csv``, ``funding_csv`` and ``ma180_csv``.
+        """
+        return self._run(params)[0]
+
+    def _run(self, params):
+        params = self._normalise_run(params)
+        key = tuple(sorted(params.items()))
+        paths = [params[k] for k in _RUN_FILES if k in params]
+        return self._runs.get(key, paths, lambda: self._simulate(params))
+
+    def _simulate(self, params):
+        system = copy.deepcopy(self.data.config_template(params["config"]))
+        result = {"kind": params["kind"]}
+        with self._stdout.capture():
+            if params["kind"] == "weekly":
+                prices = self.data.prices(params["price_file"], params["weekly"])
+                result["rows"] = [
+                    {k: _json_value(v) for k, v in row.items()}
+                    for row in simulate_weekly(system, prices)
+                ]
+            else:
+                simulate_with_deposit(
+                    system,
+                    *self.data.deposit_data(
+                        params["price_csv"], params["funding_csv"], params["ma180_csv"]
+                    ),
+                )
+        result["metrics"] = system_metrics(system)
+        return result, system
+
+    @staticmethod
+    def _normalise_run(params):
+        if not isinstance(params, dict):
+            raise ValueError("Run parameters must be a JSON object")
+        kind = params.get("kind", "deposit")
+        config = _path_param(params, "config", "config.json")
+        if kind == "weekly":
+            return {
+                "kind": kind,
+                "config": config,
+                "price_file": _path_param(params, "price_file", "btcdata.csv"),
+                "weekly": _bool_param(params, "weekly", True),
+            }
+        if kind == "deposit":
+            return {
+                "kind": kind,
+                "config": config,
+                "price_csv": _path_param(params, "price_csv", "btcdata.csv"),
+                "funding_csv": _path_param(params, "funding_csv", "merged_btc_funding.csv"),
+                "ma180_csv": _path_param(params, "ma180_csv", "btc_ma180.csv"),
+            }
+        raise ValueError(f"Unknown run kind '{kind}'")
+
+    def reload(self):
+        self.data.clear()
+        self._runs.clear()
+
+
+class SimulationRequestHandler(BaseHTTPRequestHandler):
+    server_version = "StableSim/1.0"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, allow_nan=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        data = json.loads(self.rfile.read(length))
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object")
+        return data
+
+    def _route(self, method, parts, body):
+        service = self.server.service
+        if parts == ["health"] and method == "GET":
+            return {"status": "ok", "sessions": len(service.list_sessions())}
+        if parts == ["sessions"] and method == "GET":
+            return {"sessions": service.list_sessions()}
+        if parts == ["sessions"] and method == "POST":
+            return service.create_session(
+                body.get("name"),
+                config=body.get("config", "config.json"),
+                run=body.get("run"),
+                replace=body.get("replace", False),
+            )
+        if len(parts) == 2 and parts[0] == "sessions" and method == "DELETE":
+            service.drop_session(parts[1])
+            return {"deleted": parts[1]}
+        if len(parts) == 3 and parts[0] == "sessions":
+            if parts[2] == "command" and method == "POST":
+                return service.command(parts[1], body.get("command", ""))
+            if parts[2] == "metrics" and method == "GET":
+                return service.metrics(parts[1])
+        if parts == ["runs"] and method == "POST":
+            return service.run(body)
+        if parts == ["reload"] and method == "POST":
+            service.reload()
+            return {"status": "ok"}
+        return None
+
+    def _dispatch(self, method):
+        parts = [unquote(p) for p in urlsplit(self.path).path.split("/") if p]
+        try:
+            body = self._body() if method == "POST" else {}
+            result = self._route(method, parts, body)
+        except UnknownSession as e:
+            self._send(404, {"error": f"Unknown session '{e.args[0]}'"})
+        except (ValueError, TypeError, OSError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            if result is None:
+                self._send(404, {"error": f"No route for {method} {self.path}"})
+            else:
+                self._send(200, result)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class SimulationServer(HTTPServer):
+    """HTTP server handing each connection to a fixed pool of worker threads."""
+
+    request_queue_size = 128
+
+    def __init__(self, address, service, workers=8, quiet=False):
+        super().__init__(address, SimulationRequestHandler)
+        self.service = service
+        self.quiet = quiet
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=8, quiet=False,
+                preload=False):
+    """Build a server and install the per thread stdout used by sessions.
+
+    Pass ``port=0`` to let the OS choose a free port (see ``server_address``).
+    With ``preload`` the default config and data files are parsed up front.
+    """
+    stdout = sys.stdout
+    if not isinstance(stdout, _ThreadLocalStdout):
+        stdout = _ThreadLocalStdout(sys.stdout)
+    stdout.install()
+    service = SimulationService(stdout)
+    if preload:
+        service.preload()
+    return SimulationServer((host, port), service, workers=workers, quiet=quiet)
+
+
+def main(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=8):
+    server = make_server(host, port, workers, preload=True)
+    print(f"Simulation server listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    main(port=port, workers=workers)
@@ -0,0 +1,135 @@
+import os
+import shutil
+import sys
+import threading
+
+import pytest
+
+import sim_server
+from sim_client import SimClient, SimServerError
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG = os.path.join(ROOT, "config.json")
+PRICES = os.path.join(ROOT, "btc_price_history.csv")
+
+
+@pytest.fixture
+def client():
+    stdout = sys.stdout
+    server = sim_server.make_server(port=0, quiet=True, workers=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield SimClient(port=server.server_address[1], timeout=10)
+    finally:
+        server.shutdown()
+        server.server_close()
+        sys.stdout = stdout
+
+
+def weekly_run(client, price_file=PRICES):
+    return client.run("weekly", config=CONFIG, price_file=price_file, weekly=False)
+
+
+def test_session_lifecycle(client):
+    metrics = client.create_session("a", config=CONFIG)
+    assert metrics["btc_collateral"] == 3.0
+    assert metrics["real_cov"] is None
+
+    result = client.command("a", "mint_doc 0.1")
+    assert "Minted 800.00 DoC" in result["output"]
+    assert result["metrics"]["doc_supply"] == pytest.approx(800.0)
+    assert client.metrics("a")["btc_collateral"] == pytest.approx(3.1)
+    assert client.sessions() == ["a"]
+
+    client.drop_session("a")
+    assert client.sessions() == []
+
+
+def test_unknown_session_is_404(client):
+    for call in (lambda: client.metrics("nope"), lambda: client.drop_session("nope")):
+        with pytest.raises(SimServerError) as err:
+            call()
+        assert err.value.status == 404
+
+
+@pytest.mark.parametrize(
+    "call",
+    [
+        lambda c: c.command("a", "bogus"),
+        lambda c: c.command("a", "redeem_doc 1e12"),
+        lambda c: c.create_session("a", config=CONFIG),
+        lambda c: c.create_session("z", config=5),
+        lambda c: c.create_session("z", config=["config.json"]),
+        lambda c: c.create_session("z", config="missing.json"),
+        lambda c: c.run("weekly", config=CONFIG, weekly="false"),
+        lambda c: c.run("weekly", config=CONFIG, price_file=""),
+        lambda c: c.run("deposit", config=CONFIG, ma180_csv=3),
+        lambda c: c.run("monthly", config=CONFIG),
+    ],
+)
+def test_bad_requests_are_400(client, call):
+    client.create_session("a", config=CONFIG)
+    with pytest.raises(SimServerError) as err:
+        call(client)
+    assert err.value.status == 400
+
+
+def test_repeated_run_is_cached(client, monkeypatch):
+    calls = []
+    simulate = sim_server.simulate_weekly
+
+    def counting(system, prices):
+        calls.append(1)
+        return simulate(system, prices)
+
+    monkeypatch.setattr(sim_server, "simulate_weekly", counting)
+    first = weekly_run(client)
+    assert weekly_run(client) == first
+    assert len(calls) == 1
+    assert len(first["rows"]) == 52
+
+
+def test_run_reloads_after_data_change(client, tmp_path):
+    price_file = str(tmp_path / "prices.csv")
+    shutil.copy(PRICES, price_file)
+    first = weekly_run(client, price_file)
+
+    with open(price_file, "a") as f:
+        f.write("2020-10-03,400\n")
+    stat = os.stat(price_file)
+    os.utime(price_file, (stat.st_atime, stat.st_mtime + 10))
+
+    second = weekly_run(client, price_file)
+    assert len(second["rows"]) == len(first["rows"]) + 1
+    assert second["metrics"]["price"] == 400
+
+
+def test_session_from_run(client):
+    final = weekly_run(client)["metrics"]
+    run = {"kind": "weekly", "config": CONFIG, "price_file": PRICES, "weekly": False}
+    assert client.create_session("h", run=run) == final
+
+
+def test_output_is_captured_per_request(client):
+    names = [f"s{i}" for i in range(8)]
+    for name in names:
+        client.create_session(name, config=CONFIG)
+    failures = []
+
+    def worker(i, name):
+        for step in range(25):
+            price = 10000 + i * 1000 + step
+            output = client.command(name, f"set_price {price}")["output"]
+            if output != f"BTC price set to {price:.2f} USD\n":
+                failures.append(output)
+
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(names)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert failures == []
+    assert [client.metrics(n)["price"] for n in names] == [
+        10000 + i * 1000 + 24 for i in range(8)
+    ]